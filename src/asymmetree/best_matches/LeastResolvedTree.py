@@ -37,9 +37,14 @@ def informative_triples(graph, color_dict=None):
     
     for c1, c2 in itertools.permutations(color_dict.keys(), 2):
         for a in color_dict[c1]:
-            for b1, b2 in itertools.permutations(color_dict[c2], 2):
-                if graph.has_edge(a, b1) and (not graph.has_edge(a, b2)):
+            # each unordered pair is visited once, the direction of the
+            # triple is decided by which of the two edges exists
+            for b1, b2 in itertools.combinations(color_dict[c2], 2):
+                edge1, edge2 = graph.has_edge(a, b1), graph.has_edge(a, b2)
+                if edge1 and not edge2:
                     R.append( (a, b1, b2) )
+                elif edge2 and not edge1:
+                    R.append( (a, b2, b1) )
     
     return R
 
@@ -14,6 +14,38 @@ from tralda.datastructures.Tree import Tree, TreeNode
 __author__ = 'David Schaller'
 
 
+# regular expressions for the Newick parser
+# label<color>:distance
+_LABEL_COL_DIST_REGEX = re.compile(r"'?([a-zA-Z0-9_]*)'?<(.*)>:(-?[0-9]*\.?[0-9]*[Ee]?-?[0-9]+)")
+# label<color>
+_LABEL_COL_REGEX = re.compile(r"'?([a-zA-Z0-9_]*)'?<(.*)>")
+# label:distance
+_LABEL_DIST_REGEX = re.compile(r"'?([a-zA-Z0-9_]*)'?:(-?[0-9]*\.?[0-9]*[Ee]?-?[0-9]+)")
+# characters that are relevant for splitting a Newick string into subtrees
+_DELIMITER_REGEX = re.compile(r"[(),]")
+
+
+# flat representation of a tree, see PhyloTree.to_arrays()
+TreeArrays = collections.namedtuple('TreeArrays',
+                                    ['nodes', 'parent', 'dist', 'tstamp',
+                                     'transferred', 'event'])
+
+# integer codes of the node types, -1 is used for inner nodes without an
+# event label
+EVENT_CODES = {'S': 0, 'D': 1, 'L': 2, 'H': 3, 'extant': 4}
+
+
+def _event_code(node):
+    """Integer code of the node type (see `EVENT_CODES`)."""
+    
+    if not node.children:
+        return EVENT_CODES['L'] if node.is_loss() else EVENT_CODES['extant']
+    elif node.label in ('S', 'D', 'H'):
+        return EVENT_CODES[node.label]
+    else:
+        return -1
+
+
 class PhyloTreeNode(TreeNode):
     """Tree nodes for class PhyloTree.
     
@@ -154,6 +186,62 @@ class PhyloTree(Tree):
         super().__init__(root)
     
     
+    def preorder(self):
+        """Generator for preorder traversal of the tree.
+        
+        This function overrides the function of the parent class. It uses an
+        explicit stack instead of nested generators, and hence the cost per
+        node does not grow with its depth.
+        
+        Yields
+        ------
+        PhyloTreeNode
+            All nodes of the tree in pre-order.
+        """
+        
+        if not self.root:
+            return
+        
+        yield self.root
+        stack = [iter(self.root.children)]
+        
+        while stack:
+            child = next(stack[-1], None)
+            if child is None:
+                stack.pop()
+            else:
+                yield child
+                stack.append(iter(child.children))
+    
+    
+    def postorder(self):
+        """Generator for post-order traversal of the tree.
+        
+        This function overrides the function of the parent class. It uses an
+        explicit stack instead of nested generators, and hence the cost per
+        node does not grow with its depth.
+        
+        Yields
+        ------
+        PhyloTreeNode
+            All nodes of the tree in post-order.
+        """
+        
+        if not self.root:
+            return
+        
+        stack = [(self.root, iter(self.root.children))]
+        
+        while stack:
+            node, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                yield node
+            else:
+                stack.append((child, iter(child.children)))
+    
+    
     def sorted_nodes(self, oldest_to_youngest=True):
         """List of nodes sorted by timestamp.
         
@@ -315,25 +403,23 @@ class PhyloTree(Tree):
             coherent sequence.
         """
         
-        color_dict = {}
+        color_dict = collections.defaultdict(list)
         
         for leaf in self.leaves():
-            if leaf.color not in color_dict:
-                color_dict[leaf.color] = []
             color_dict[leaf.color].append(leaf)
         
+        # plain dict, i.e. no new entries on access with unknown colors
+        color_dict = dict(color_dict)
+        
         if not return_list:
             return color_dict
         else:
-            leaves = []
-            for color, leaf_list in color_dict.items():
-                for leaf in leaf_list:
-                    leaves.append(leaf)
+            leaves = list(itertools.chain.from_iterable(color_dict.values()))
             
             return color_dict, leaves
     
     
-    def distance_matrix(self, leaf_order=None):
+    def distance_matrix(self, leaf_order=None, dtype=np.float64):
         """Distance matrix on the leaf set of the phylogenetic tree.
         
         Computes a distance matrix on the set of leaves of the tree where each
@@ -349,44 +435,123 @@ class PhyloTree(Tree):
             A list of all leaves in the tree defining the indices for the
             matrix (the default is None, in which case leaves are indexed in
             sibling order).
+        dtype : numpy dtype, optional
+            The data type of the returned matrix (the default is numpy.float64).
+            For large trees, numpy.float32 halves the memory of the matrix; the
+            distances are computed in double precision in any case.
         
         Returns
         -------
         list of PhyloTreeNode objects
             Represents the order for the lines/columns in the distance matrix.
-        numpy.ndarray (dtype=numpy.float)
+        numpy.ndarray
             The distance matrix.
         """
         
         distance_dict = self.distances_from_root()
-        self.supply_leaves()
+        leaves, lca_depth = self.leaf_lca_matrix(distance_dict)
         
         if leaf_order:
-            if set(leaf_order) != set(self.root.leaves):
+            if set(leaf_order) != set(leaves):
                 raise ValueError('ordered leaf list does not match with the '\
                                  'leaves in the tree')
+        
+        # D = depth(x) + depth(y) - 2 depth(lca(x,y)), without temporaries
+        depth = lca_depth.diagonal().copy()
+        D = np.add.outer(depth, depth)
+        lca_depth *= 2
+        D -= lca_depth
+        del lca_depth
+        np.fill_diagonal(D, 0.0)
+        
+        if leaf_order:
+            leaf_index = {l: i for i, l in enumerate(leaves)}
+            permutation = [leaf_index[l] for l in leaf_order]
+            D = D[np.ix_(permutation, permutation)]
             leaves = leaf_order
-        else:
-            # leaves in sibling order
-            leaves = self.root.leaves      
         
+        return leaves, D.astype(dtype, copy=False)
+    
+    
+    def leaf_lca_matrix(self, values):
+        """Values of the last common ancestors of all pairs of leaves.
+        
+        The leaves are indexed in sibling order. Since the leaves below any
+        node then form a contiguous interval, the entries for all pairs of
+        leaves that are separated by a node are set by one slice assignment
+        per child.
+        
+        Parameters
+        ----------
+        values : dict
+            Maps the nodes of the tree to numbers, e.g. the dictionary
+            returned by `distances_from_root()`.
+        
+        Returns
+        -------
+        list of PhyloTreeNode objects
+            Represents the order for the lines/columns in the matrix.
+        numpy.ndarray (dtype=numpy.float64)
+            The matrix with entries `values[lca(x, y)]` for all pairs of
+            leaves x and y (in particular `values[x]` on the diagonal).
+        """
+        
+        leaves = self.supply_leaves()
         leaf_index = {l: i for i, l in enumerate(leaves)}
         
-        D = np.zeros((len(leaves),len(leaves)), dtype=np.float)
+        n = len(leaves)
+        M = np.zeros((n, n), dtype=np.float64)
         
         for v in self.preorder():
-            if v.children:
-                for c1, c2 in itertools.combinations(v.children, 2):
-                    for x in c1.leaves:
-                        x_index = leaf_index[x]
-                        x_dist = distance_dict[x] - distance_dict[v]
-                        for y in c2.leaves:
-                            y_index = leaf_index[y]
-                            y_dist = distance_dict[y] - distance_dict[v]
-                            D[x_index, y_index] = x_dist + y_dist
-                            D[y_index, x_index] = x_dist + y_dist
+            if len(v.children) > 1:
+                v_value = values[v]
+                end = leaf_index[v.leaves[0]] + len(v.leaves)
+                for c in v.children:
+                    c_start = leaf_index[c.leaves[0]]
+                    c_end = c_start + len(c.leaves)
+                    M[c_start:c_end, c_end:end] = v_value
+                    M[c_end:end, c_start:c_end] = v_value
+        
+        np.fill_diagonal(M, np.fromiter((values[l] for l in leaves),
+                                        dtype=np.float64, count=n))
+        
+        return leaves, M
+    
+    
+    def to_arrays(self):
+        """Flat array representation of the tree.
+        
+        The nodes are indexed by their position in the preorder, and the
+        node attributes are stored in contiguous arrays (structure of arrays)
+        such that sweeps over all nodes do not have to follow the references
+        between the node objects.
+        
+        Returns
+        -------
+        TreeArrays
+            Named tuple with the list of the nodes in preorder ('nodes'), the
+            index of the parent of each node with -1 for the root ('parent'),
+            the distances ('dist'), the time stamps with NaN for missing time
+            stamps ('tstamp'), the transfer status as bool ('transferred'),
+            and the node types as int8 codes ('event', see `EVENT_CODES`).
+        """
         
-        return leaves, D
+        nodes = list(self.preorder())
+        index = {v: i for i, v in enumerate(nodes)}
+        
+        parent = np.fromiter((index.get(v.parent, -1) for v in nodes),
+                             dtype=np.int64, count=len(nodes))
+        dist = np.fromiter((v.dist for v in nodes),
+                           dtype=np.float64, count=len(nodes))
+        tstamp = np.fromiter((v.tstamp if v.tstamp is not None else np.nan
+                              for v in nodes),
+                             dtype=np.float64, count=len(nodes))
+        transferred = np.fromiter((v.transferred for v in nodes),
+                                  dtype=bool, count=len(nodes))
+        event = np.fromiter((_event_code(v) for v in nodes),
+                            dtype=np.int8, count=len(nodes))
+        
+        return TreeArrays(nodes, parent, dist, tstamp, transferred, event)
     
     
     def distances_from_root(self):
@@ -399,16 +564,16 @@ class PhyloTree(Tree):
             (sum of `dist`) to the root.
         """
         
-        distance_dict = {}
+        arrays = self.to_arrays()
+        parent = arrays.parent.tolist()
+        dist = arrays.dist.tolist()
         
-        for v in self.preorder():
-            if not v.parent:
-                distance_dict[v] = 0.0
-            else:
-                depth = distance_dict[v.parent] + v.dist
-                distance_dict[v] = depth
+        # parents precede their children in the preorder
+        depth = [0.0] * len(parent)
+        for i in range(1, len(parent)):
+            depth[i] = depth[parent[i]] + dist[i]
                 
-        return distance_dict
+        return dict(zip(arrays.nodes, depth))
     
     
     def topology_only(self, inplace=True):
@@ -454,24 +619,11 @@ class PhyloTree(Tree):
             genes).
         """
         
-        counts = {'S': 0, 'D': 0, 'L': 0, 'H': 0, 'extant': 0}
+        event = np.fromiter((_event_code(v) for v in self.preorder()),
+                            dtype=np.int8)
+        bins = np.bincount(event[event >= 0], minlength=len(EVENT_CODES))
         
-        for v in self.preorder():
-            
-            if not v.children:
-                if v.is_loss():
-                    counts['L'] += 1
-                else:
-                    counts['extant'] += 1
-            
-            elif v.label == 'S':
-                counts['S'] += 1
-            elif v.label == 'D':
-                counts['D'] += 1
-            elif v.label == 'H':
-                counts['H'] += 1
-        
-        return counts        
+        return {key: int(bins[code]) for key, code in EVENT_CODES.items()}
     
 
 # --------------------------------------------------------------------------
@@ -508,39 +660,66 @@ class PhyloTree(Tree):
             A Newick representation of the tree.
         """
         
-        def _to_newick(node):
+        parts = []
+        
+        def _color_token(node):
             
-            if not node.children:
-                token = ''
-                if label:
-                    token += str(node.label)
-                if color and node.color:
-                    token += '<{}-{}>'.format(*node.color) \
-                        if isinstance(node.color, (tuple, list)) \
-                        else '<{}>'.format(node.color)
-                if distance:
-                    token += ":{}".format(node.dist)
-                return token
+            if not node.color:
+                return ''
+            elif isinstance(node.color, (tuple, list)):
+                return '<{}-{}>'.format(*node.color)
             else:
-                s = ''
-                for child in node.children:
-                    s += _to_newick(child) + ','
-                token = ''
-                if label and label_inner:
-                    token += str(node.label)
-                if color_inner and node.color:
-                    token += '<{}-{}>'.format(*node.color) \
-                        if isinstance(node.color, (tuple, list)) \
-                        else '<{}>'.format(node.color)
-                if distance:
-                    token += ':{}'.format(node.dist)
-                return '({}){}'.format(s[:-1], token)
+                return '<{}>'.format(node.color)
         
+        def _token_writer(with_label, with_color):
+            """Function that appends the token of a node to the buffer.
+            
+            The flags are resolved once here, and not for every node.
+            """
+            
+            template = ('{0.label}' if with_label else '') + \
+                       ('{1}' if with_color else '') + \
+                       (':{0.dist}' if distance else '')
+            
+            if with_color:
+                return lambda node: parts.append(
+                    template.format(node, _color_token(node)))
+            else:
+                return lambda node: parts.append(template.format(node))
         
-        if self.root:
-            return _to_newick(self.root) + ';'
-        else:
+        leaf_token = _token_writer(label, color)
+        inner_token = _token_writer(label and label_inner, color_inner)
+        
+        if not self.root:
             return ';'
+        elif not self.root.children:
+            leaf_token(self.root)
+            parts.append(';')
+            return ''.join(parts)
+        
+        # every subtree is followed by a ',' which is replaced by ')' when
+        # the parent is closed, and by ';' at the very end
+        parts.append('(')
+        stack = [(self.root, iter(self.root.children))]
+        
+        while stack:
+            node, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                parts[-1] = ')'
+                inner_token(node)
+                parts.append(',')
+            elif child.children:
+                parts.append('(')
+                stack.append((child, iter(child.children)))
+            else:
+                leaf_token(child)
+                parts.append(',')
+        
+        parts[-1] = ';'
+        
+        return ''.join(parts)
     
     
     @staticmethod
@@ -573,13 +752,6 @@ class PhyloTree(Tree):
         and need to be converted to integers afterwards if necessary.
         """
         
-        # label<color>:distance
-        label_col_dist_regex = re.compile(r"'?([a-zA-Z0-9_]*)'?<(.*)>:(-?[0-9]*\.?[0-9]*[Ee]?-?[0-9]+)")
-        # label<color>
-        label_col_regex = re.compile(r"'?([a-zA-Z0-9_]*)'?<(.*)>")
-        # label:distance
-        label_dist_regex = re.compile(r"'?([a-zA-Z0-9_]*)'?:(-?[0-9]*\.?[0-9]*[Ee]?-?[0-9]+)")
-        
         id_counter = 0
         
         def parse_subtree(subroot, subtree_string):
@@ -597,14 +769,15 @@ class PhyloTree(Tree):
                         raise ValueError('invalid Newick string')
                     parse_subtree(node, child[1:end])               # recursive call 'parse_subtree'
                 child = child[end+1:].strip()
-                label_col_dist = label_col_dist_regex.match(child)
+                label_col_dist = _LABEL_COL_DIST_REGEX.match(child)
                 if label_col_dist:                                  # CASE 1: label<color>:distance
                     node.label = label_col_dist.group(1)
                     node.color = label_col_dist.group(2)
                     node.dist = float(label_col_dist.group(3))
                 else:
-                    label_col = label_col_regex.match(child)
-                    label_dist = label_dist_regex.match(child)
+                    label_col = _LABEL_COL_REGEX.match(child)
+                    label_dist = (_LABEL_DIST_REGEX.match(child)
+                                  if not label_col else None)
                     if label_col:                                   # CASE 2: label<color>
                         node.label = label_col.group(1)
                         node.color = label_col.group(2)
@@ -622,22 +795,20 @@ class PhyloTree(Tree):
             
             stack = 0
             children = []
-            current = ""
-            for c in child_string:
+            start = 0
+            # only jump between delimiters and slice out the children
+            for match in _DELIMITER_REGEX.finditer(child_string):
+                c = match.group()
                 if (stack == 0) and c == ',':
-                    children.append(current)
-                    current = ""
+                    children.append(child_string[start:match.start()])
+                    start = match.end()
                 elif c == '(':
                     stack += 1
-                    current += c
                 elif c == ')':
                     if stack <= 0:
                         raise ValueError('invalid Newick string')
                     stack -= 1
-                    current += c
-                else:
-                    current += c
-            children.append(current.strip())
+            children.append(child_string[start:].strip())
             return children
         
         if not isinstance(newick, str):
@@ -1153,14 +1324,14 @@ def delete_losses_and_contract(tree, inplace=False):
     if not inplace:
         tree = tree.copy()
     
-    loss_nodes = []
-    for node in tree.postorder():
-        if not node.children and node.is_loss():
-            loss_nodes.append(node)
-    
-    # traverse from loss node to root delete if degree <= 1
-    for loss_node in loss_nodes:
-        current = tree.delete_and_reconnect(loss_node,
+    # delete the loss leaves in postorder and suppress every (non-root)
+    # ancestor that is left with a single child
+    for node in list(tree.postorder()):
+        
+        if node.children or not node.is_loss():
+            continue
+        
+        current = tree.delete_and_reconnect(node,
                                             add_distances=True,
                                             keep_transferred=True)
         
@@ -28,6 +28,7 @@ class GenomeSimulator:
             
         self.true_gene_trees = []
         self.observable_gene_trees = []
+        self.sequence_dicts = []
         
     
     def _check_outdir(self):
@@ -62,8 +63,7 @@ class GenomeSimulator:
                                       for tree in self.true_gene_trees]
         
         # sequences should be emptied here if methods were called before
-        if hasattr(self, 'sequence_dicts'):
-            self.sequence_dicts.clear()
+        self.sequence_dicts.clear()
         
         if self.outdir:
             for i in range(N):
@@ -83,10 +83,7 @@ class GenomeSimulator:
         
         self.subst_model = subst_model
         
-        if hasattr(self, 'sequence_dicts'):
-            self.sequence_dicts.clear()
-        else:
-            self.sequence_dicts = []
+        self.sequence_dicts.clear()
         
         if root_genome:
             if len(root_genome) != len(self.number_of_families):
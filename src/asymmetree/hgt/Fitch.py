@@ -3,6 +3,7 @@
 
 import itertools
 
+import numpy as np
 import networkx as nx
 
 from tralda.datastructures import LCA
@@ -43,12 +44,14 @@ def fitch(tree, transfer_edges, supply_undirected=False, lca_T=None):
     Keyword arguments:
         supply_undirected - additionally return the undirected Fitch graph,
             default is False
-        lca_T - instance of LCA corresponding to the tree, default is False
-            in which case a new instance is created and used
-    """
+        lca_T - no longer required and only kept for compatibility, default
+            is None
     
-    if not isinstance(lca_T, LCA):
-        lca_T = LCA(tree)
+    There is an arc (x, y) if and only if x is not contained in the subtree
+    below the first transfer edge on the path from y to the root. Since the
+    leaves below any node form a contiguous interval in the list of leaves,
+    the arcs are computed on leaf indices in a single vectorized step.
+    """
         
     if not isinstance(transfer_edges, (set, dict)):
         transfer_edges = set(transfer_edges)
@@ -56,24 +59,39 @@ def fitch(tree, transfer_edges, supply_undirected=False, lca_T=None):
     leaves = tree.supply_leaves()
     fitch = nx.DiGraph()
     
-    # store for each leaf the first transfer edge on the way to the root
-    first_transfer = {}
-    
-    for x in leaves:
-        fitch.add_node(x.ID, label=x.label, color=x.color)
-        
-        current = x
-        while current:
-            if current in transfer_edges:
-                first_transfer[x] = current
-                break
-            current = current.parent
-    
-    for x, y in itertools.permutations(leaves, 2):
-        
-        if (y in first_transfer and
-            lca_T.ancestor_not_equal(lca_T(x, y), first_transfer[y])):
-            fitch.add_edge(x.ID, y.ID)
+    fitch.add_nodes_from((x.ID, {'label': x.label, 'color': x.color})
+                         for x in leaves)
+    
+    # first transfer edge on the way to the root, propagated top-down
+    transfer_above = {}
+    for v in tree.preorder():
+        if v in transfer_edges:
+            transfer_above[v] = v
+        elif v.parent:
+            transfer_above[v] = transfer_above[v.parent]
+        else:
+            transfer_above[v] = None
+    
+    # group the leaves (by index) by their first transfer edge on the way
+    # to the root
+    targets = {}
+    for i, x in enumerate(leaves):
+        t = transfer_above[x]
+        if t is not None:
+            if t not in targets:
+                targets[t] = []
+            targets[t].append(i)
+    
+    # interval of the leaves below each transfer edge
+    leaf_index = {x: i for i, x in enumerate(leaves)}
+    intervals = [(leaf_index[t.leaves[0]], leaf_index[t.leaves[0]] + len(t.leaves))
+                 for t in targets]
+    
+    sources, dests = _fitch_arcs(len(leaves), intervals, targets.values())
+    
+    leaf_IDs = [x.ID for x in leaves]
+    fitch.add_edges_from((leaf_IDs[i], leaf_IDs[j])
+                         for i, j in zip(sources.tolist(), dests.tolist()))
     
     if not supply_undirected:
         return fitch
@@ -81,12 +99,37 @@ def fitch(tree, transfer_edges, supply_undirected=False, lca_T=None):
         return fitch, fitch.to_undirected()
     
 
+def _fitch_arcs(n, intervals, targets):
+    """Arcs of the Fitch graph as a pair of arrays of leaf indices.
+    
+    Keyword arguments:
+        n - number of leaves
+        intervals - (start, end) of the leaf indices below each transfer edge
+        targets - for each transfer edge, the indices of the leaves for which
+            it is the first transfer edge on the way to the root
+    """
+    
+    source_parts, dest_parts = [], []
+    
+    for (start, end), target_indices in zip(intervals, targets):
+        
+        sources = np.r_[0:start, end:n]
+        target_indices = np.asarray(target_indices, dtype=int)
+        source_parts.append(np.repeat(sources, len(target_indices)))
+        dest_parts.append(np.tile(target_indices, len(sources)))
+    
+    if not source_parts:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+    
+    return np.concatenate(source_parts), np.concatenate(dest_parts)
+    
+
 def undirected_fitch(tree, transfer_edges, lca_T=None):
     """Returns the undirected Fitch graph.
     
     Keyword arguments:
-        lca_T - instance of LCA corresponding to the tree, default is False
-            in which case a new instance is created and used
+        lca_T - no longer required and only kept for compatibility, default
+            is None
     """
     
     return fitch(tree, transfer_edges, supply_undirected=True, lca_T=lca_T)[1]
@@ -1,9 +1,9 @@
 # -*- coding: utf-8 -*-
 
 import itertools
+import numpy as np
 import networkx as nx
 
-from tralda.datastructures import LCA
 from tralda.cograph import Cotree
 from tralda.supertree import Build
 
@@ -16,35 +16,39 @@ __author__ = 'David Schaller'
 
 
 def below_equal_above(T, S, lca_T=None, lca_S=None):
+    """Compare the divergence times in T and S for all pairs of leaves in T.
     
-    L_T = [l for l in T.leaves()]
-    L_S = {l.ID: l for l in S.leaves()}
+    The time stamps of the last common ancestors of all pairs of leaves are
+    computed as matrices, and the comparisons are done in one vectorized step.
+    The parameters 'lca_T' and 'lca_S' are no longer required and only kept
+    for compatibility.
+    """
+    
+    L_T, t_T = T.leaf_lca_matrix({v: v.tstamp for v in T.preorder()})
+    L_S, t_S = S.leaf_lca_matrix({v: v.tstamp for v in S.preorder()})
     
     below = nx.Graph()
     equal = nx.Graph()
     above = nx.Graph()
-    for u in L_T:
-        below.add_node(u.ID, label=u.label, color=u.color)
-        equal.add_node(u.ID, label=u.label, color=u.color)
-        above.add_node(u.ID, label=u.label, color=u.color)
-    
-    if not isinstance(lca_T, LCA):
-        lca_T = LCA(T)
-    if not isinstance(lca_S, LCA):
-        lca_S = LCA(S)
-    
-    for a, b in itertools.combinations(L_T, 2):
-        
-        t_ab = lca_T.get(a, b).tstamp
-        t_AB = lca_S.get(L_S[a.color], L_S[b.color]).tstamp
-        
-        if t_ab < t_AB:
-            below.add_edge(a.ID, b.ID)
-        elif t_ab == t_AB:
-            equal.add_edge(a.ID, b.ID)
-        else:
-            above.add_edge(a.ID, b.ID)
-    
+    nodes = [(u.ID, {'label': u.label, 'color': u.color}) for u in L_T]
+    below.add_nodes_from(nodes)
+    equal.add_nodes_from(nodes)
+    above.add_nodes_from(nodes)
+    
+    # time stamps of the lca's of the corresponding species
+    S_index = {l.ID: i for i, l in enumerate(L_S)}
+    colors = [S_index[u.color] for u in L_T]
+    t_S = t_S[np.ix_(colors, colors)]
+    
+    IDs = [u.ID for u in L_T]
+    rows, cols = np.triu_indices(len(L_T), k=1)
+    t_ab, t_AB = t_T[rows, cols], t_S[rows, cols]
+    
+    for graph, mask in ((below, t_ab < t_AB),
+                        (equal, t_ab == t_AB),
+                        (above, t_ab > t_AB)):
+        graph.add_edges_from((IDs[i], IDs[j]) for i, j in
+                             zip(rows[mask].tolist(), cols[mask].tolist()))
     
     return below, above, equal
 
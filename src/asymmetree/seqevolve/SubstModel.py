@@ -47,9 +47,17 @@ class SubstModel:
         
         self.alphabet_dict = {item: index for index, item in enumerate(self.alphabet)}
         
+        # byte --> index in the alphabet, -1 for all other characters
+        self.index_table = np.full(256, -1, dtype=np.int8)
+        self.index_table[np.frombuffer(self.alphabet.encode('ascii'),
+                                       dtype=np.uint8)] = np.arange(len(self.alphabet))
+        
         self._load_exchangeability_and_freqs()
         self._build_rate_matrix()
         
+        # eigensystem of Q, computed on demand
+        self.eigenvals, self.U, self.U_inv = None, None, None
+    
     
     def _load_exchangeability_and_freqs(self):
         """Load the exchangeability matrix S and the stationary frequencies pi."""
@@ -122,7 +130,7 @@ class SubstModel:
     
     def eigensystem(self):
         
-        if not hasattr(self, 'eigenvals'):
+        if self.eigenvals is None:
             self.eigenvals, self.U, self.U_inv = diagonalize(self.Q, self.freqs)
         
         return self.eigenvals, self.U, self.U_inv
@@ -134,22 +142,27 @@ class SubstModel:
         P(t) = U x e^(Lambda*t) x U^(-1)."""
         
         # ensure that eigensystem has been computed
-        self.eigensystem()
+        eigenvals, U, U_inv = self.eigensystem()
         
         # first multiplication element-wise, since corresponding matrix
         # only has non-zero entries on the diagonal
         
-        return (self.U * np.exp(self.eigenvals * t))  @  self.U_inv
+        return (U * np.exp(eigenvals * t))  @  U_inv
         
     
     def to_indices(self, sequence):
         
         try:
-            result = [self.alphabet_dict[letter] for letter in sequence]
-        except KeyError:
+            sequence = ''.join(sequence).encode('ascii')
+        except (TypeError, UnicodeEncodeError):
+            raise ValueError('invalid sequence for the specified model')
+        
+        result = self.index_table[np.frombuffer(sequence, dtype=np.uint8)]
+        
+        if np.any(result < 0):
             raise ValueError('invalid sequence for the specified model')
             
-        return result
+        return result.tolist()
     
     
     def to_sequence(self, evoseq):
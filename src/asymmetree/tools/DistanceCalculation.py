@@ -18,8 +18,14 @@ __author__ = 'David Schaller'
 
 MIN_LENGTH = 1e-6
 MAX_LENGTH = 20.0
+GAP = ord('-')
 #MAXITER = 100
 
+# byte --> 1 (purine), 2 (pyrimidine) or 0 (other character)
+_NUC_CLASS = np.zeros(256, dtype=np.int8)
+_NUC_CLASS[[ord(c) for c in 'AaGgRr']] = 1
+_NUC_CLASS[[ord(c) for c in 'CcTtUuYy']] = 2
+
 
 def maximum_likelihood_distance(seq1, seq2,
                                 subst_model=None,
@@ -72,17 +78,49 @@ def _to_indices(seq1, seq2, subst_model):
     
     if len(seq1) != len(seq2):
         raise ValueError("unequal sequence lengths: {} and {}".format(len(seq1), len(seq2)))
+    
+    # byte --> index in the alphabet, -1 for all other characters
+    lookup = subst_model.index_table
+    
+    seq1, seq2 = _encode(seq1), _encode(seq2)
+    valid = (seq1 != GAP) & (seq2 != GAP)
+    
+    seqs = np.vstack((_lookup(lookup, seq1[valid]),
+                      _lookup(lookup, seq2[valid])))
+    
+    if np.any(seqs < 0):
+        raise ValueError('invalid sequence for the specified model')
+    
+    return seqs
 
-    seq1_indeces, seq2_indeces = [], []
+
+def _encode(seq):
+    """Array of the character codes of a sequence.
     
-    for i in range(len(seq1)):
-        
-        if seq1[i] != '-' and seq2[i] != '-':
-            
-            seq1_indeces.append( subst_model.alphabet_dict[seq1[i]] )
-            seq2_indeces.append( subst_model.alphabet_dict[seq2[i]] )
+    ASCII sequences are encoded as bytes, all other sequences as Unicode
+    code points.
+    """
+    
+    if not isinstance(seq, str):
+        seq = ''.join(seq)
+    
+    try:
+        return np.frombuffer(seq.encode('ascii'), dtype=np.uint8)
+    except UnicodeEncodeError:
+        return np.frombuffer(seq.encode('utf-32-le'), dtype=np.uint32)
 
-    return np.asarray([seq1_indeces, seq2_indeces], dtype=int)     
+
+def _lookup(table, codes):
+    """Look up character codes in a table over the byte range.
+    
+    Codes beyond the byte range are mapped to 0xFF, which is not part of
+    any alphabet.
+    """
+    
+    if codes.dtype != np.uint8:
+        codes = np.minimum(codes, 255)
+    
+    return table[codes]
 
 
 def p_distance(seq1, seq2, exclude_gaps=True):
@@ -98,20 +136,16 @@ def p_distance(seq1, seq2, exclude_gaps=True):
     if len(seq1) != len(seq2):
         raise ValueError("unequal sequence lengths: {} and {}".format(len(seq1), len(seq2)))
         
-    diffs, valid_columns = 0, 0
+    seq1, seq2 = _encode(seq1), _encode(seq2)
+    gaps1, gaps2 = (seq1 == GAP), (seq2 == GAP)
     
-    for i in range(len(seq1)):
-        
-        if seq1[i] != '-' and seq2[i] != '-':
-            
-            valid_columns += 1
-            if seq1[i] != seq2[i]:
-                diffs += 1
-        
-        elif not exclude_gaps and (seq1[i] != '-' or seq2[i] != '-'):
-            
-            valid_columns += 1
-            diffs += 1
+    if exclude_gaps:
+        valid = ~gaps1 & ~gaps2
+    else:
+        valid = ~(gaps1 & gaps2)
+    
+    valid_columns = int(np.count_nonzero(valid))
+    diffs = int(np.count_nonzero((seq1 != seq2) & valid))
             
     p = diffs / valid_columns if valid_columns > 0 else float('inf')
     
@@ -135,6 +169,71 @@ def JC69_distance(seq1, seq2, exclude_gaps=True, amino_acid=False,
         return d, var_d
 
 
+def distance_matrix(alignment, model='p', exclude_gaps=True,
+                    amino_acid=False):
+    """Pairwise distance matrix of a set of aligned sequences.
+    
+    The sequences are encoded once into a single byte matrix and each
+    sequence is compared against all remaining sequences in one vectorized
+    step.
+    
+    Keyword arguments:
+        alignment - dict (e.g. Evolver.true_alignment()) or list of
+            (key, sequence) tuples
+        model - 'p' (p-distance) or 'JC69' (Jukes Cantor 1969), default='p'
+        exclude_gaps - ignore columns with a gap in one sequence,
+           gaps in both sequences are always ignored; default=True.
+        amino_acid - only relevant for 'JC69', default=False
+    
+    Returns the list of keys (defining the order of lines/columns) and the
+    distance matrix.
+    """
+    
+    if model not in ('p', 'JC69'):
+        raise ValueError("model '{}' is not available".format(model))
+    
+    if isinstance(alignment, dict):
+        alignment = alignment.items()
+    
+    keys, sequences = [], []
+    for key, seq in alignment:
+        keys.append(key)
+        sequences.append(_encode(seq))
+    
+    n = len(keys)
+    D = np.zeros((n, n), dtype=np.float64)
+    if n == 0:
+        return keys, D
+    
+    if len({len(seq) for seq in sequences}) > 1:
+        raise ValueError('unequal sequence lengths')
+    
+    A = np.vstack(sequences)
+    gaps = (A == GAP)
+    
+    for i in range(n-1):
+        
+        diffs = (A[i] != A[i+1:])
+        if exclude_gaps:
+            valid = ~gaps[i] & ~gaps[i+1:]
+        else:
+            valid = ~(gaps[i] & gaps[i+1:])
+        
+        diff_count = np.count_nonzero(diffs & valid, axis=1)
+        valid_count = np.count_nonzero(valid, axis=1)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            p = np.where(valid_count > 0, diff_count / valid_count, np.inf)
+        
+        if model == 'JC69':
+            p = _JC69_transform_array(p, amino_acid=amino_acid)
+        
+        D[i, i+1:] = p
+        D[i+1:, i] = p
+    
+    return keys, D
+
+
 def _JC69_transform(p, amino_acid=False):
     """Jukes Cantor 1969 transformation of p-distance."""
     
@@ -150,6 +249,19 @@ def _JC69_transform(p, amino_acid=False):
     return d
 
 
+def _JC69_transform_array(p, amino_acid=False):
+    """Jukes Cantor 1969 transformation of an array of p-distances."""
+    
+    a = 3 if not amino_acid else 19     # numerator
+    b = 4 if not amino_acid else 20     # denominator
+    
+    d = np.full_like(p, np.nan, dtype=np.float64)
+    mask = p < a / b
+    d[mask] = - (a/b) * np.log(1 - (b/a) * p[mask])
+    
+    return d
+
+
 def _JC69_distance_var(p, n, amino_acid=False):
     """Jukes Cantor 1969 distance variance."""
     
@@ -183,31 +295,21 @@ def K80_distance(seq1, seq2, variance=False):
 def _IV_proportions(seq1, seq2):
     """Computes the proportions of transitions and transversions."""
     
-    purines = {'A', 'a', 'G', 'g', 'R', 'r'}
-    pyrimidines = {'C', 'c', 'T', 't', 'U', 'u', 'Y', 'y'}
-    
     if len(seq1) != len(seq2):
         raise ValueError("unequal sequence lengths: {} and {}".format(len(seq1), len(seq2)))
-        
-    transitions, transversions, valid_columns = 0, 0, 0
     
-    for i in range(len(seq1)):
-        
-        if seq1[i] != '-' and seq2[i] != '-':
-            
-            valid_columns += 1
-            
-            if seq1[i] == seq2[i]:
-                continue
-            
-            elif ((seq1[i] in purines and seq2[i] in purines) or
-                  (seq1[i] in pyrimidines and seq2[i] in pyrimidines)):
-                transitions += 1
-            
-            elif ((seq1[i] in purines and seq2[i] in pyrimidines) or
-                  (seq1[i] in pyrimidines and seq2[i] in purines)):
-                transversions += 1
-                
+    seq1, seq2 = _encode(seq1), _encode(seq2)
+    valid = (seq1 != GAP) & (seq2 != GAP)
+    valid_columns = int(np.count_nonzero(valid))
+    
+    # only columns with different characters are relevant
+    mask = valid & (seq1 != seq2)
+    class1 = _lookup(_NUC_CLASS, seq1[mask])
+    class2 = _lookup(_NUC_CLASS, seq2[mask])
+    both_classified = (class1 > 0) & (class2 > 0)
+    
+    transitions = int(np.count_nonzero(both_classified & (class1 == class2)))
+    transversions = int(np.count_nonzero(both_classified & (class1 != class2)))
             
     S = transitions / valid_columns if valid_columns > 0 else float('nan')
     V = transversions / valid_columns if valid_columns > 0 else float('nan')
@@ -134,7 +134,7 @@ class Sampler:
                 
                 rate = self._params[1]
                 
-                if not isinstance(mean , float) or rate < 0.0:
+                if not isinstance(rate, float) or rate < 0.0:
                     raise ValueError('rate must be a float >=0.0')
                 
                 self._distr = 'exponential'
@@ -200,6 +200,69 @@ class Sampler:
                              '<= maximum')
             
                 
+    def draw_batch(self, n, rng=None):
+        """Draw n values at once.
+        
+        Equivalent to n calls of draw() but with vectorized numpy calls,
+        values outside of [minimum, maximum] are redrawn.
+        
+        Keyword argument:
+            n - number of values to be drawn
+            rng - numpy random Generator, default is the global numpy random
+                state
+        
+        Returns a numpy array of length n.
+        """
+        
+        if self._distr == 'constant':
+            return np.full(n, self._exp_val)
+        
+        if rng is None:
+            rng = np.random
+        
+        result = np.empty(n)
+        filled = 0
+        
+        while filled < n:
+            x = self._draw_raw_batch(n - filled, rng) + self._shift
+            
+            if self._discrete:
+                x = np.round(x)
+            if self._min:
+                x = x[x >= self._min]
+            if self._max:
+                x = x[x <= self._max]
+            
+            result[filled:filled+len(x)] = x
+            filled += len(x)
+        
+        return result
+    
+    
+    def _draw_raw_batch(self, n, rng):
+        """Draw n values from the distribution without shift and bounds."""
+        
+        if self._distr == 'uniform':
+            return rng.uniform(low=self._a, high=self._b, size=n)
+        elif self._distr == 'discrete_uniform':
+            if isinstance(rng, np.random.Generator):
+                return rng.integers(self._a, high=self._b, size=n)
+            return rng.randint(self._a, high=self._b, size=n)
+        elif self._distr == 'gamma':
+            return rng.gamma(self._shape, scale=self._scale, size=n)
+        elif self._distr == 'exponential':
+            if self._rate == 0.0:
+                return np.full(n, float('inf'))
+            return rng.exponential(scale=1/self._rate, size=n)
+        elif self._distr == 'zipf':
+            return rng.zipf(self._a, size=n)
+        elif self._distr == 'negative_binomial':
+            return rng.negative_binomial(self._r, 1 - self._q, size=n)
+        else:
+            raise ValueError("batch sampling is not supported for "\
+                             "distribution '{}'".format(self._distr))
+    
+    
     def _draw_constant(self):
         
         return self._exp_val
@@ -6,8 +6,12 @@ Assign asymmetric evolution rates to the branches of a gene tree.
 Introduce evolution rate asymmetries and autocorrelation.
 """
 
+import random
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 
+from asymmetree.datastructures.PhyloTree import EVENT_CODES
 from asymmetree.treeevolve.GeneTree import GeneTreeSimulator
 from asymmetree.tools.Sampling import Sampler
 
@@ -15,6 +19,11 @@ from asymmetree.tools.Sampling import Sampler
 __author__ = 'David Schaller'
 
 
+# marking of the genes in the rate assignment
+_CONSERVED = 0
+_DIVERGENT = 1
+
+
 # --------------------------------------------------------------------------
 #                         USER INTERFACE FUNCTION
 # --------------------------------------------------------------------------
@@ -24,6 +33,7 @@ def simulate_gene_trees(S, N=1,
                         loss_rate=0.0,
                         hgt_rate=0.0,
                         base_rate=1.0,
+                        n_jobs=1,
                         **kwargs):
     """Simulates dated gene trees with non-ultrametric edge lengths along a
     species tree.
@@ -39,38 +49,106 @@ def simulate_gene_trees(S, N=1,
             default is constant 0.0
         base_rate -- (distribution for the) evolution rate at the roots of
             the gene trees, default is constant 1.0
+        n_jobs -- number of processes for the simulation of the gene trees,
+            default is 1; for n_jobs > 1, the processes are seeded from 'rng'
+            if supplied and otherwise from the global numpy random state
         kwargs -- see arguments of GeneTreeSimulator.simulate and assign_rates
         """
     
+    if not isinstance(n_jobs, int) or n_jobs < 1:
+        raise ValueError('n_jobs must be an int >= 1')
+    
     gene_trees = []
     simulator = GeneTreeSimulator(S)
     
     dupl_rate_sampler = Sampler(dupl_rate)
     loss_rate_sampler = Sampler(loss_rate)
     hgt_rate_sampler = Sampler(hgt_rate)
-    base_rate_sampler = Sampler(dupl_rate)
+    base_rate_sampler = Sampler(base_rate)
+    
+    # default as in assign_rates
+    rate_increase_sampler = Sampler(kwargs.get('rate_increase',
+                                               ('gamma', 0.5, 2.2)),
+                                    shift=1.0)
     
-    # autocorrelation between genes of the same or related species
+    # lookup tables of the species tree are shared by all replicates
+    species_tables = _species_tables(S)
+    
+    # autocorrelation between genes of the same or related species, the
+    # factors are drawn once and shared by all replicates
     autocorr_variance = kwargs.pop('autocorr_variance', 0.0)
-    _, autocorr_factors = autocorrelation_factors(S, autocorr_variance)
+    rng = kwargs.pop('rng', None)
+    if autocorr_variance > 0.0:
+        _, edge_rates = autocorrelation_factors(S, autocorr_variance, rng=rng)
+        autocorr_factors = _edge_factors(edge_rates, species_tables)
+    else:
+        autocorr_factors = None
     
     # main simulation and imbalancing
-    for i in range(N):
+    if n_jobs == 1:
+        for i in range(N):
+            
+            TGT = simulator.simulate(dupl_rate=dupl_rate_sampler.draw(),
+                                     loss_rate=loss_rate_sampler.draw(),
+                                     hgt_rate=hgt_rate_sampler.draw(),
+                                     **kwargs)
+            assign_rates(TGT, S,
+                         base_rate=base_rate_sampler.draw(),
+                         autocorr_factors=autocorr_factors,
+                         species_tables=species_tables,
+                         rate_increase_sampler=rate_increase_sampler,
+                         rng=rng,
+                         **kwargs)
+            gene_trees.append(TGT)
+    
+    # independent replicates in parallel processes
+    else:
+        rates = [(dupl_rate_sampler.draw(), loss_rate_sampler.draw(),
+                  hgt_rate_sampler.draw(), base_rate_sampler.draw())
+                 for i in range(N)]
+        entropy = (rng.integers(2**32) if rng is not None else
+                   np.random.randint(2**32))
+        seed_seq = np.random.SeedSequence(entropy)
+        seeds = [int(child.generate_state(1)[0])
+                 for child in seed_seq.spawn(N)]
         
-        TGT = simulator.simulate(dupl_rate=dupl_rate_sampler.draw(),
-                                 loss_rate=loss_rate_sampler.draw(),
-                                 hgt_rate=hgt_rate_sampler.draw(),
-                                 **kwargs)
-        assign_rates(TGT, S,
-                     base_rate=base_rate_sampler.draw(),
-                     autocorr_factors=autocorr_factors,
-                     **kwargs)
-        gene_trees.append(TGT)
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            gene_trees = list(executor.map(_simulate_gene_tree,
+                                           [simulator] * N, seeds, rates,
+                                           [autocorr_factors] * N,
+                                           [species_tables] * N,
+                                           [rate_increase_sampler] * N,
+                                           [kwargs] * N,
+                                           chunksize=max(1, N // (4*n_jobs))))
     
     if N == 1:
         return gene_trees[0]
     else:
         return gene_trees
+
+
+def _simulate_gene_tree(simulator, seed, rates, autocorr_factors,
+                        species_tables, rate_increase_sampler, kwargs):
+    """Simulate and imbalance a single gene tree in a worker process."""
+    
+    # the random module is used in the gene tree simulation as well
+    random.seed(seed)
+    np.random.seed(seed)
+    
+    dupl_rate, loss_rate, hgt_rate, base_rate = rates
+    
+    TGT = simulator.simulate(dupl_rate=dupl_rate,
+                             loss_rate=loss_rate,
+                             hgt_rate=hgt_rate,
+                             **kwargs)
+    assign_rates(TGT, simulator.S,
+                 base_rate=base_rate,
+                 autocorr_factors=autocorr_factors,
+                 species_tables=species_tables,
+                 rate_increase_sampler=rate_increase_sampler,
+                 **kwargs)
+    
+    return TGT
     
 
     
@@ -86,6 +164,9 @@ def assign_rates(T, S, base_rate=1.0,
                  rate_increase=('gamma', 0.5, 2.2),
                  CSN_weights=(1, 1, 1),
                  inplace=True,
+                 species_tables=None,
+                 rate_increase_sampler=None,
+                 rng=None,
                  **kwargs):
     """Assigns realistic evolution rates to a TRUE gene tree.
     
@@ -94,7 +175,8 @@ def assign_rates(T, S, base_rate=1.0,
     
     Keyword arguments:
     base_rate -- mean of substitution rate for conserved genes
-    autocorr_factors -- autocorrelation rate factors for the edges of S
+    autocorr_factors -- autocorrelation rate factors for the edges of S, as
+        returned by autocorrelation_factors or as array (see _edge_factors)
     autocorr_variance -- autocorrelation variance factor for lognormal
         distribution, only relevant if 'autocorrelation_rates' are not supplied 
     rate_increase -- distribution of the (relative) rate increase (w.r.t. the
@@ -103,26 +185,48 @@ def assign_rates(T, S, base_rate=1.0,
     CSN_weights -- weights for choice between conservation, subfunctionalization
         and neofunctionalization
     inplace -- if False, copy the tree before imbalancing
+    species_tables -- lookup tables of S (see _species_tables), computed if
+        not supplied
+    rate_increase_sampler -- Sampler for the factors 1 + x, constructed
+        from 'rate_increase' if not supplied
+    rng -- numpy random Generator (e.g. np.random.default_rng(seed)), default
+        is the global numpy random state
     """
     
     if not inplace:
         T = T.copy()
      
     # factors for subfunctionalization/neofunctionalization
-    CSN_weights = np.asarray(CSN_weights) / sum(CSN_weights)
-    sampler = Sampler(rate_increase, shift=1.0)
-    _divergent_rates(T, S, sampler, CSN_weights)
+    CSN_cdf = np.cumsum(CSN_weights, dtype=np.float64)
+    CSN_cdf /= CSN_cdf[-1]
+    if rate_increase_sampler is None:
+        rate_increase_sampler = Sampler(rate_increase, shift=1.0)
+    if species_tables is None:
+        species_tables = _species_tables(S)
+    _divergent_rates(T, rate_increase_sampler, CSN_cdf, species_tables, rng)
+    
+    # distances of all nodes as one array for the remaining scaling steps
+    nodes = list(T.preorder())
+    dists = np.fromiter((v.dist for v in nodes),
+                        dtype=np.float64, count=len(nodes))
     
     # autocorrelation
-    if autocorr_factors:
-        _apply_autocorrelation(T, autocorr_factors, inplace=True)
+    if autocorr_factors is not None:
+        if isinstance(autocorr_factors, dict):
+            autocorr_factors = _edge_factors(autocorr_factors, species_tables)
+        dists *= _autocorrelation_array(nodes, autocorr_factors,
+                                        species_tables)
     elif autocorr_variance > 0.0:
-        _, edge_rates = autocorrelation_factors(S, autocorr_variance)
-        _apply_autocorrelation(T, edge_rates, inplace=True)
+        _, edge_rates = autocorrelation_factors(S, autocorr_variance, rng=rng)
+        dists *= _autocorrelation_array(nodes,
+                                        _edge_factors(edge_rates, species_tables),
+                                        species_tables)
     
     # finally apply base rate
-    for v in T.preorder():
-        v.dist *= base_rate
+    dists *= base_rate
+    
+    for v, dist in zip(nodes, dists.tolist()):
+        v.dist = dist
     
     return T
 
@@ -131,147 +235,321 @@ def assign_rates(T, S, base_rate=1.0,
 #                       EVOLUTION RATE ASYMMETRY
 # --------------------------------------------------------------------------
 
-def _adjust_distances(T, rates):
+def _adjust_distances(T_nodes, rates):
     
-    for edge, rate_list in rates.items():
-        time_points = np.asarray([tstamp for tstamp, _ in rate_list] + [edge[1].tstamp])
-        rate_values = np.asarray([rate for _, rate in rate_list])
-        edge[1].dist = np.dot(-np.diff(time_points), rate_values)
+    edge_first, next_entry, rate_tstamps, rate_values = rates
+    
+    for i, v in enumerate(T_nodes):
+        
+        if not v.parent:
+            continue
+        
+        # walk through the linked list of the edge (parent(v), v) and sum up
+        # the time spans between consecutive rate changes times the rates
+        dist = 0.0
+        k = edge_first[i]
+        while k >= 0:
+            end = rate_tstamps[next_entry[k]] if next_entry[k] >= 0 else v.tstamp
+            dist += (rate_tstamps[k] - end) * rate_values[k]
+            k = next_entry[k]
+        
+        v.dist = dist
         
 
-def _duplication_type(marked_as, CSN_weights):
+def _duplication_type(marked_as, r, x):
+    """
+    Parameters:
+        marked_as -- marking of the duplicated gene
+        r -- random choice 0, 1, or 2 according to the CSN weights
+        x -- random number in [0, 1)
+    """
     
-    if marked_as == 'divergent':
-        return 'divergent', 'divergent'
+    if marked_as == _DIVERGENT:
+        return _DIVERGENT, _DIVERGENT
     else:
-        r = np.random.choice(3, p=CSN_weights)
         if r == 0:                                  # conservation
-            return 'conserved', 'conserved'
+            return _CONSERVED, _CONSERVED
         elif r == 1:                                # subfunctionalization
-            return 'divergent', 'divergent'
+            return _DIVERGENT, _DIVERGENT
         else:                                       # neofunctionalization
-            if np.random.uniform() < 0.5:
-                return 'divergent', 'conserved'
+            if x < 0.5:
+                return _DIVERGENT, _CONSERVED
             else:
-                return 'conserved', 'divergent'
+                return _CONSERVED, _DIVERGENT
+
+
+def _species_tables(S):
+    """Lookup tables of the species tree for the rate assignment.
+    
+    Returns a dict that maps the species tree nodes to their parents and a
+    dict that maps the colors of gene tree nodes, i.e. the species tree nodes
+    v as well as the edges (parent(v), v), to the consecutive indices of the
+    edges (parent(v), v).
+    """
+    
+    S_parents = {}
+    color_index = {}
+    for k, (S_u, S_v) in enumerate(S.edges()):
+        if S_v.ID in S_parents or S_v.ID == S.root.ID:
+            raise ValueError('node IDs of the species tree are not unique: '\
+                             '{}'.format(S_v.ID))
+        S_parents[S_v.ID] = S_u.ID
+        color_index[S_v.ID] = k
+        color_index[(S_u.ID, S_v.ID)] = k
+    
+    return S_parents, color_index
 
 
-def _divergent_rates(T, S, sampler, CSN_weights):
+def _divergent_rates(T, sampler, CSN_cdf, species_tables, rng=None):
     """
     Parameters:
         sampler -- sampler for rate increase for divergent genes
-        CSN_weights -- weights for choice between conservation,
-            subfunctionalization and neofunctionalization
+        CSN_cdf -- cumulative (normalized) weights for choice between
+            conservation, subfunctionalization and neofunctionalization
+        species_tables -- result of _species_tables(S)
+        rng -- numpy random Generator, default is the global random state
+    """
+    
+    # no rate increase, i.e. all rates are 1.0 and the events do not matter
+    if sampler._distr == 'constant' and sampler._exp_val == 1.0:
+        for v in T.preorder():
+            if v.parent:
+                v.dist = v.parent.tstamp - v.tstamp
+        return T
+    
+    arrays = T.to_arrays()
+    
+    # the nodes are indexed from oldest to youngest (ties in preorder), the
+    # index of v also identifies the edge (parent(v), v)
+    order = np.argsort(-arrays.tstamp, kind='stable')
+    index = np.empty_like(order)
+    index[order] = np.arange(len(order))
+    T_nodes = [arrays.nodes[i] for i in order]
+    
+    # node attributes as lists indexed by the nodes' indices
+    # the (planted) root is treated like a speciation
+    event = arrays.event[order]
+    event[arrays.parent[order] < 0] = EVENT_CODES['S']
+    event = event.tolist()
+    parent = np.where(arrays.parent[order] >= 0,
+                      index[arrays.parent[order]], -1).tolist()
+    tstamp = arrays.tstamp[order].tolist()
+    transferred = arrays.transferred[order].tolist()
+    
+    # species tree edge of each node, -1 for the root
+    S_parents, color_index = species_tables
+    edge_id = [color_index[v.color] if v.parent else -1 for v in T_nodes]
+    
+    # children in sibling order, which is preserved in the preorder
+    children = [[] for _ in T_nodes]
+    for i in index.tolist():
+        if parent[i] >= 0:
+            children[parent[i]].append(i)
+    
+    # random numbers in batches: at most one rate increase per edge, and
+    # the choices for the duplication types
+    n_dupl = event.count(EVENT_CODES['D'])
+    if rng is None:
+        rng = np.random
+    rate_increases = iter(sampler.draw_batch(len(T_nodes), rng=rng).tolist())
+    dupl_choices = np.searchsorted(CSN_cdf, rng.uniform(size=n_dupl),
+                                   side='right')
+    dupl_choices = iter(dupl_choices.tolist())
+    dupl_uniforms = iter(rng.uniform(size=n_dupl).tolist())
+    
+    rates = _divergent_rates_core(event, parent, children, tstamp,
+                                  transferred, edge_id, len(S_parents),
+                                  rate_increases, dupl_choices, dupl_uniforms)
+    
+    _adjust_distances(T_nodes, rates)
+    return T
+
+
+def _divergent_rates_core(event, parent, children, tstamp, transferred,
+                          edge_id, n_edges, rate_increases, dupl_choices,
+                          dupl_uniforms):
+    """Rate changes along the edges of a gene tree.
+    
+    Works exclusively on the node indices, i.e. the positions in the lists
+    of node attributes, which must be sorted from oldest to youngest.
+    
+    Parameters:
+        edge_id -- index of the species tree edge of each node
+        n_edges -- number of edges in the species tree
+        rate_increases, dupl_choices, dupl_uniforms -- iterators over the
+            pre-drawn random numbers
+    
+    Returns the rate changes as linked lists per edge (see add_rate).
     """
     
-    T_nodes = T.sorted_nodes()
-    rates = {edge: [] for edge in T.edges()}        # edge --> list of (tstamp, rate) tuples
+    # (tstamp, rate) entries of all edges in flat lists, the entries of an
+    # edge form a linked list given by its first/last entry and successors
+    edge_first = [-1] * len(event)
+    edge_last = [-1] * len(event)
+    next_entry, rate_tstamps, rate_values = [], [], []
+    last_rate = [1.0] * len(event)          # current rate of each edge
+    
+    def add_rate(i, tstamp, rate):
+        
+        k = len(rate_values)
+        if edge_last[i] < 0:
+            edge_first[i] = k
+        else:
+            next_entry[edge_last[i]] = k
+        edge_last[i] = k
+        next_entry.append(-1)
+        rate_tstamps.append(tstamp)
+        rate_values.append(rate)
+        last_rate[i] = rate
+    
+    # genes per species tree edge as doubly-linked lists of node indices,
+    # insertion at the head and removal in constant time
+    head = [-1] * n_edges
+    prev_gene = [-1] * len(event)
+    next_gene = [-1] * len(event)
+    
+    def add_gene(e, v):
+        
+        prev_gene[v] = -1
+        next_gene[v] = head[e]
+        if head[e] >= 0:
+            prev_gene[head[e]] = v
+        head[e] = v
     
-    S_parents = {v.ID: v.parent.ID for v in S.preorder() if v.parent}
-    gene_counter = {(e[0].ID, e[1].ID): [] for e in S.edges()}
-    marked = {v: 'conserved' for v in T_nodes}      # marked as conserved or divergent
+    def remove_gene(e, u):
+        
+        if prev_gene[u] >= 0:
+            next_gene[prev_gene[u]] = next_gene[u]
+        else:
+            head[e] = next_gene[u]
+        if next_gene[u] >= 0:
+            prev_gene[next_gene[u]] = prev_gene[u]
+    
+    marked = [_CONSERVED] * len(event)      # marked as conserved or divergent
     
-    for u in T_nodes:
+    for u in range(len(event)):
         
         # ----------------- SPECIATION -----------------
-        if u.label in ('S', ''):
-            for v in u.children:
+        if event[u] == EVENT_CODES['S']:
+            for v in children[u]:
                 marked[v] = marked[u]
-                S_u = u.color
-                S_v = v.color if not isinstance(v.color, (tuple, list)) else v.color[1]
-                gene_counter[(S_u, S_v)].append(v)
-                new_rate = sampler.draw() if marked[v] == 'divergent' else 1.0
-                rates[(u,v)].append((u.tstamp, new_rate))
+                add_gene(edge_id[v], v)
+                new_rate = next(rate_increases) if marked[v] == _DIVERGENT else 1.0
+                add_rate(v, tstamp[u], new_rate)
             
         # ---------------- DUPLICATION -----------------
-        elif u.label == "D":
-            marked[u.children[0]], marked[u.children[1]] = _duplication_type(marked[u],
-                                                                             CSN_weights)
-            gene_counter[u.color].remove(u)
-            for v in u.children:
-                gene_counter[u.color].append(v)
-                new_rate = sampler.draw() if marked[v] == 'divergent' else 1.0
-                rates[(u,v)].append((u.tstamp, new_rate))
+        elif event[u] == EVENT_CODES['D']:
+            marked[children[u][0]], marked[children[u][1]] = _duplication_type(marked[u],
+                                                                               next(dupl_choices),
+                                                                               next(dupl_uniforms))
+            e = edge_id[u]
+            remove_gene(e, u)
+            for v in children[u]:
+                add_gene(e, v)
+                new_rate = next(rate_increases) if marked[v] == _DIVERGENT else 1.0
+                add_rate(v, tstamp[u], new_rate)
         
         # ------------------- LOSS ---------------------
-        elif u.is_loss():
-            gene_counter[u.color].remove(u)
-            if len(gene_counter[u.color]) == 1:
-                v = gene_counter[u.color][0]
-                if marked[v] == 'divergent':
-                    marked[v] = 'conserved'
-                    rates[(v.parent,v)].append((u.tstamp, 1.0))
+        elif event[u] == EVENT_CODES['L']:
+            e = edge_id[u]
+            remove_gene(e, u)
+            v = head[e]
+            if v >= 0 and next_gene[v] < 0:     # single remaining gene
+                if marked[v] == _DIVERGENT:
+                    marked[v] = _CONSERVED
+                    add_rate(v, tstamp[u], 1.0)
         
         # ---------- HORIZONTAL GENE TRANSFER ----------
-        elif u.label == "H":
-            v1, v2 = u.children
-            if v1.transferred:
+        elif event[u] == EVENT_CODES['H']:
+            v1, v2 = children[u]
+            if transferred[v1]:
                 v1, v2 = v2, v1         # now v2 is the transferred copy
                 
             # untransferred copy
             marked[v1] = marked[u]
-            gene_counter[u.color].remove(u)
-            gene_counter[u.color].append(v1)
-            if u.parent:
-                rates[(u,v1)].append((u.tstamp, rates[(u.parent,u)][-1][1]))
+            e = edge_id[u]
+            remove_gene(e, u)
+            add_gene(e, v1)
+            if parent[u] >= 0:
+                add_rate(v1, tstamp[u], last_rate[u])
             else:
-                new_rate = sampler.draw() if marked[v1] == 'divergent' else 1.0
-                rates[(u,v1)].append((u.tstamp, new_rate))
+                new_rate = next(rate_increases) if marked[v1] == _DIVERGENT else 1.0
+                add_rate(v1, tstamp[u], new_rate)
             
             # transferred copy
-            marked[v2] = 'divergent'
-            if isinstance(v2.color, (tuple, list)):
-                gene_counter[v2.color].append(v2)
-            else:
-                gene_counter[(S_parents[v2.color], v2.color)].append(v2)
-            new_rate = sampler.draw() if marked[v2] == 'divergent' else 1.0
-            rates[(u,v2)].append((u.tstamp, new_rate))
+            marked[v2] = _DIVERGENT
+            add_gene(edge_id[v2], v2)
+            new_rate = next(rate_increases) if marked[v2] == _DIVERGENT else 1.0
+            add_rate(v2, tstamp[u], new_rate)
             
-    _adjust_distances(T, rates)
-    return T
+    return edge_first, next_entry, rate_tstamps, rate_values
 
 # --------------------------------------------------------------------------
 #                         AUTOCORRELATION
 # --------------------------------------------------------------------------
     
-def autocorrelation_factors(tree, variance):
+def autocorrelation_factors(tree, variance, rng=None):
     """Geometric Brownian motion process to assign rate factors to species tree.
     
     The parameter 'variance' is a hyperparameter for a log-normal distribution
     from which offspring rates are drawn. The overall variance of this
-    distribution is 'variance' * divergence time.
+    distribution is 'variance' * divergence time. The normal variates are
+    drawn from 'rng' (numpy random Generator) if supplied and otherwise from
+    the global numpy random state.
     """
     
-    node_rates = {}                 # maps node v --> rate of v
-    edge_rates = {}                 # maps v of edge (u,v) --> rate of (u,v)
+    if rng is None:
+        rng = np.random
     
-    for v in tree.preorder():
-        if not v.parent:
-            # assign factor 1.0 to root (= expected value for all other nodes
-            # and edges)
-            node_rates[v.ID] = 1.0
-            edge_rates[v.ID] = 1.0
-        else:
-            var = variance * v.dist
-            # ensure that exp. value is equal to parent's rate
-            mu = np.log(node_rates[v.parent.ID]) - var/2
-            
-            node_rates[v.ID] = np.exp(np.random.normal(mu, np.sqrt(var)))
-            
-            # edge rate as arithmetic mean of u and v
-            edge_rates[v.ID] = (node_rates[v.parent.ID] + node_rates[v.ID]) / 2
-            
-    return node_rates, edge_rates
+    arrays = tree.to_arrays()
+    parent = arrays.parent.tolist()
+    IDs = [v.ID for v in arrays.nodes]
+    
+    # increments of the log-rates in one batch, the shift -var/2 ensures
+    # that the exp. value is equal to the parent's rate; the root gets
+    # factor 1.0 (= expected value for all other nodes and edges)
+    var = variance * arrays.dist
+    increments = np.sqrt(var) * rng.standard_normal(len(IDs)) - var/2
+    increments[arrays.parent < 0] = 0.0
+    
+    # cumulate along the paths from the root (parents precede children)
+    log_rates = increments.tolist()
+    for i in range(len(IDs)):
+        if parent[i] >= 0:
+            log_rates[i] += log_rates[parent[i]]
+    
+    node_rates = np.exp(log_rates)
+    
+    # edge rate as arithmetic mean of u and v
+    edge_rates = np.where(arrays.parent < 0, 1.0,
+                          (node_rates + node_rates[arrays.parent]) / 2)
+    
+    # maps node v --> rate of v, and v of edge (u,v) --> rate of (u,v)
+    return (dict(zip(IDs, node_rates.tolist())),
+            dict(zip(IDs, edge_rates.tolist())))
 
 
-def _apply_autocorrelation(T, edge_rates, inplace=True):
+def _edge_factors(edge_rates, species_tables):
+    """Autocorrelation factors of the species tree edges as numpy array.
     
-    if not inplace:
-        T = T.copy()
+    The factors are ordered by the edge indices in 'species_tables', the
+    additional last entry 1.0 is used for the root of a gene tree.
+    """
     
-    for v in T.preorder():
-        if v.parent:
-            edge_ID = v.color[1] if isinstance(v.color, (tuple, list)) else v.color
-            v.dist *= edge_rates[edge_ID]
+    S_parents, _ = species_tables
+    factors = [edge_rates[S_v] for S_v in S_parents]
+    factors.append(1.0)
     
-    return T
+    return np.asarray(factors)
+
+
+def _autocorrelation_array(nodes, edge_factors, species_tables):
+    """Autocorrelation factors of the edges (parent(v), v) of a list of nodes.
+    
+    Returns a numpy array with factor 1.0 for the root.
+    """
+    
+    _, color_index = species_tables
+    color_ids = [color_index[v.color] if v.parent else -1 for v in nodes]
+    
+    return edge_factors[color_ids]
@@ -271,18 +271,33 @@ def simulate_timing(tree):
     
     It is t(root) = 1 and t(x) = 0 for x in L(S)."""
     
+    children = {}                           # inner node --> list of children
     for v in tree.preorder():
         if not v.children:
             v.tstamp = 0.0
-        elif not v.parent:
-            v.tstamp = 1.0
-        else:                               # random walk to a leaf
-            pos = v                         # current position
-            length = 0                      # path length |P|
-            while pos.children:
-                length += 1
-                pos = pos.children[np.random.randint(len(pos.children))]
-            v.tstamp = v.parent.tstamp * (1 - 2 * np.random.uniform() / (length+1))
+        else:
+            children[v] = list(v.children)
+            if not v.parent:
+                v.tstamp = 1.0
+    
+    # all random numbers are drawn in blocks, the random walks consume
+    # a pool that is refilled when exhausted
+    inner = [v for v in children if v.parent]
+    block_size = len(children)
+    factors = np.random.uniform(size=len(inner)).tolist()
+    pool, k = np.random.uniform(size=block_size).tolist(), 0
+    
+    for v, factor in zip(inner, factors):   # (preorder)
+        pos = v                             # current position
+        length = 0                          # path length |P|
+        while pos in children:              # random walk to a leaf
+            if k == block_size:
+                pool, k = np.random.uniform(size=block_size).tolist(), 0
+            options = children[pos]
+            pos = options[int(pool[k] * len(options))]
+            k += 1
+            length += 1
+        v.tstamp = v.parent.tstamp * (1 - 2 * factor / (length+1))
             
 
 def distance_from_timing(tree):
@@ -317,7 +332,7 @@ def _yule(N, birth_rate):
     
     branches = [(1, tree.root)]
     forward_time = 0.0
-    node_counter = 1
+    node_counter = 2                # IDs 0 and 1 are already in use
     
     while len(branches) < N:
         
@@ -359,7 +374,7 @@ def _yule_age(age, birth_rate):
     
     branches = [(1, tree.root)]
     forward_time = 0.0
-    node_counter = 1
+    node_counter = 2                # IDs 0 and 1 are already in use
     
     while forward_time < age:
         
@@ -7,6 +7,7 @@ from treeevolve_tests import *
 from seqevolve_tests import *
 from bmg_tests import *
 from hgt_tests import *
+from tools_tests import *
 
 
 __author__ = 'David Schaller'
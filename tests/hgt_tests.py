@@ -1,9 +1,12 @@
 # -*- coding: utf-8 -*-
 
-import unittest
+import unittest, itertools, random
 
 import tralda.tools.GraphTools as gt
 from tralda.cograph import Cotree
+from tralda.datastructures import LCA
+
+from asymmetree.datastructures import PhyloTree
 
 import asymmetree.treeevolve as te
 import asymmetree.hgt as hgt
@@ -61,6 +64,45 @@ class TestHGT(unittest.TestCase):
         
         self.assertTrue(len(colors) == N and len(leaves) == N)
             
+    
+    def test_fitch_arcs(self):
+        
+        def brute_force_arcs(tree, transfer_edges):
+            # reference: first transfer edge above each leaf and LCA queries
+            lca_T = LCA(tree)
+            leaves = tree.supply_leaves()
+            first_transfer = {}
+            for x in leaves:
+                current = x
+                while current:
+                    if current in transfer_edges:
+                        first_transfer[x] = current
+                        break
+                    current = current.parent
+            return {(x.ID, y.ID) for x, y in itertools.permutations(leaves, 2)
+                    if (y in first_transfer and
+                        lca_T.ancestor_not_equal(lca_T(x, y),
+                                                 first_transfer[y]))}
+        
+        N = 20
+        repeats = 20
+        
+        for _ in range(repeats):
+            
+            tree = PhyloTree.random_colored_tree(N, 5)
+            nodes = list(tree.preorder())
+            
+            transfer_edges = set(random.sample(nodes, random.randint(0, 6)))
+            # a transferred leaf and, in some cases, a transferred root
+            transfer_edges.add(random.choice(tree.supply_leaves()))
+            if random.random() < 0.3:
+                transfer_edges.add(tree.root)
+            
+            fitch = hgt.fitch(tree, transfer_edges)
+            
+            self.assertSetEqual(set(fitch.edges()),
+                                brute_force_arcs(tree, transfer_edges))
+
 
 if __name__ == '__main__':
     
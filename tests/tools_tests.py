@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+
+import unittest, math, random
+
+import numpy as np
+
+from asymmetree.tools.Sampling import Sampler
+import asymmetree.tools.DistanceCalculation as dc
+
+
+__author__ = 'David Schaller'
+
+
+class TestSampling(unittest.TestCase):
+    
+    
+    def test_draw_batch(self):
+        
+        n = 1000
+        
+        for params in (('uniform', 0.5, 2.0),
+                       ('discrete_uniform', 1, 10),
+                       ('gamma', 0.5, 2.2),
+                       ('exponential', 1.0),
+                       ('zipf', 1.821),
+                       ('negative_binomial', 2, 0.5)):
+            
+            sampler = Sampler(params)
+            self.assertEqual(len(sampler.draw_batch(n)), n)
+            
+            rng = np.random.default_rng(0)
+            self.assertEqual(len(sampler.draw_batch(n, rng=rng)), n)
+    
+    
+    def test_draw_batch_bounds(self):
+        
+        n = 1000
+        
+        sampler = Sampler(('gamma', 1.0, 1.0), minimum=0.5, maximum=2.0)
+        x = sampler.draw_batch(n)
+        self.assertEqual(len(x), n)
+        self.assertTrue(np.all((x >= 0.5) & (x <= 2.0)))
+        
+        sampler = Sampler(('zipf', 1.5), maximum=20, discrete=True)
+        x = sampler.draw_batch(n)
+        self.assertEqual(len(x), n)
+        self.assertTrue(np.all(x <= 20))
+        
+        sampler = Sampler(('uniform', 0.0, 1.0), shift=1.0, discrete=True)
+        x = sampler.draw_batch(n)
+        self.assertTrue(np.all((x == 1.0) | (x == 2.0)))
+    
+    
+    def test_draw_batch_constant(self):
+        
+        for params in (3.5, ('constant', 3.5)):
+            
+            sampler = Sampler(params, shift=1.0)
+            x = sampler.draw_batch(10)
+            self.assertEqual(len(x), 10)
+            self.assertTrue(np.all(x == 4.5))
+            self.assertEqual(sampler.draw(), 4.5)
+
+
+
+class TestDistanceCalculation(unittest.TestCase):
+    
+    
+    def test_distance_matrix(self):
+        
+        length = 50
+        repeats = 10
+        
+        for _ in range(repeats):
+            
+            alignment = [(i, ''.join(random.choice('ACGT--')
+                                     for _ in range(length)))
+                         for i in range(6)]
+            
+            # two all-gap sequences have no valid columns
+            alignment.append((6, '-' * length))
+            alignment.append((7, '-' * length))
+            
+            for exclude_gaps in (True, False):
+                
+                keys, D_p = dc.distance_matrix(alignment, model='p',
+                                               exclude_gaps=exclude_gaps)
+                _, D_JC = dc.distance_matrix(dict(alignment), model='JC69',
+                                             exclude_gaps=exclude_gaps)
+                
+                self.assertListEqual(keys, [key for key, _ in alignment])
+                
+                expected_p = np.zeros(D_p.shape)
+                expected_JC = np.zeros(D_JC.shape)
+                for i, (_, seq1) in enumerate(alignment):
+                    for j, (_, seq2) in enumerate(alignment):
+                        if i != j:
+                            expected_p[i, j] = dc.p_distance(
+                                seq1, seq2, exclude_gaps=exclude_gaps)[0]
+                            expected_JC[i, j] = dc.JC69_distance(
+                                seq1, seq2, exclude_gaps=exclude_gaps)
+                
+                self.assertTrue(np.allclose(D_p, expected_p, equal_nan=True))
+                self.assertTrue(np.allclose(D_JC, expected_JC,
+                                            equal_nan=True))
+                self.assertTrue(np.isinf(D_p[6, 7]))
+                self.assertTrue(np.isnan(D_JC[6, 7]))
+        
+        with self.assertRaises(ValueError):
+            dc.distance_matrix([(0, 'ACGT'), (1, 'ACG')])
+        
+        keys, D = dc.distance_matrix([])
+        self.assertListEqual(keys, [])
+        self.assertEqual(D.shape, (0, 0))
+    
+    
+    def test_K80_distance(self):
+        
+        # columns:  1. A/G  transition      8. R/Y  transversion
+        #           2. G/A  transition      9. Y/T  transition
+        #           3. C/T  transition     10. N/A  unclassified
+        #           4. T/T  identical      11. -/C  gap, ignored
+        #           5. a/G  transition     12. A/-  gap, ignored
+        #           6. G/c  transversion   13. -/-  gaps, ignored
+        #           7. U/C  transition     14. u/a  transversion
+        # followed by 20 identical columns
+        seq1 = 'AGCTaGURYN-A-u' + 5 * 'ACGT'
+        seq2 = 'GATTGcCYTAC--a' + 5 * 'ACGT'
+        
+        S, V, n = dc._IV_proportions(seq1, seq2)
+        self.assertEqual(n, 31)
+        self.assertAlmostEqual(S, 6/31)
+        self.assertAlmostEqual(V, 3/31)
+        
+        a1, a2 = 16/31, 25/31       # 1 - 2S - V and 1 - 2V
+        d, kappa, var_d = dc.K80_distance(seq1, seq2, variance=True)
+        self.assertAlmostEqual(d, -0.5 * math.log(a1) - 0.25 * math.log(a2))
+        self.assertAlmostEqual(kappa, 2 * math.log(a1) / math.log(a2) - 1)
+        a, b = 1/a1, 0.5 * (1/a1 + 1/a2)
+        self.assertAlmostEqual(var_d, (a**2 * 6/31 + b**2 * 3/31
+                                       - (a * 6/31 + b * 3/31)**2) / 31)
+        
+        # 10 differences in 31 columns without gaps, and 12 differences in
+        # 33 columns that are not gaps in both sequences
+        self.assertEqual(dc.p_distance(seq1, seq2), (10/31, 31))
+        self.assertEqual(dc.p_distance(seq1, seq2, exclude_gaps=False),
+                         (12/33, 33))
+        
+        # saturated and empty alignments
+        self.assertTrue(math.isnan(dc.K80_distance('AGCT', 'GATC')[0]))
+        S, V, n = dc._IV_proportions('A-', '-G')
+        self.assertEqual(n, 0)
+        self.assertTrue(math.isnan(S) and math.isnan(V))
+        self.assertTrue(math.isnan(dc.K80_distance('A-', '-G')[0]))
+    
+    
+    def test_non_ascii(self):
+        
+        p, n = dc.p_distance('A\u00c4C', 'ABC')
+        self.assertAlmostEqual(p, 1/3)
+        self.assertEqual(n, 3)
+        
+        self.assertEqual(dc.p_distance('\u00c4\u00d6-', '\u00c4\u00dcG'),
+                         (0.5, 2))
+        
+        # non-ASCII characters are neither purines nor pyrimidines
+        self.assertEqual(dc._IV_proportions('A\u00c4CT', 'GACC'),
+                         (0.5, 0.0, 4))
+        
+        with self.assertRaises(ValueError):
+            dc.maximum_likelihood_distance('A\u00c4C', 'AGC',
+                                           model_type='n', model_name='JC69')
+
+
+if __name__ == '__main__':
+    
+    unittest.main()
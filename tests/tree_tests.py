@@ -1,8 +1,14 @@
 # -*- coding: utf-8 -*-
 
-import unittest, os
+import unittest, os, random
+
+from tralda.datastructures import LCA
+from tralda.datastructures.Tree import Tree
 
 from asymmetree.datastructures import PhyloTree
+from asymmetree.datastructures.PhyloTree import (delete_losses_and_contract,
+                                                 EVENT_CODES)
+import asymmetree.treeevolve as te
 
 
 __author__ = 'David Schaller'
@@ -27,8 +33,101 @@ class TestTrees(unittest.TestCase):
             label_color2 = [(v.label, v.color) for v in tree2.supply_leaves()]
             
             self.assertListEqual(label_color, label_color2)
+            
+    
+    def test_traversals(self):
+        
+        N, colors = 30, 5
+        repeats = 20
+        
+        for _ in range(repeats):
+            
+            tree = PhyloTree.random_colored_tree(N, colors)
+            
+            self.assertListEqual(list(tree.preorder()),
+                                 list(Tree.preorder(tree)))
+            self.assertListEqual(list(tree.postorder()),
+                                 list(Tree.postorder(tree)))
 
     
+    def test_leaf_lca_matrix(self):
+        
+        N, colors = 30, 5
+        repeats = 20
+        
+        for _ in range(repeats):
+            
+            tree = PhyloTree.random_colored_tree(N, colors)
+            lca_T = LCA(tree)
+            values = {v: random.random() for v in tree.preorder()}
+            
+            leaves, M = tree.leaf_lca_matrix(values)
+            
+            self.assertListEqual(leaves, tree.supply_leaves())
+            for i, x in enumerate(leaves):
+                for j, y in enumerate(leaves):
+                    self.assertEqual(M[i, j], values[lca_T(x, y)])
+    
+    
+    def test_to_arrays(self):
+        
+        def event_code(v):
+            if not v.children:
+                return EVENT_CODES['L' if v.is_loss() else 'extant']
+            return EVENT_CODES.get(v.label, -1)
+        
+        repeats = 20
+        
+        for _ in range(repeats):
+            
+            S = te.simulate_species_tree(10, model='innovation')
+            T = te.simulate_dated_gene_tree(S, dupl_rate=1.0, loss_rate=1.0,
+                                            hgt_rate=0.5)
+            
+            arrays = T.to_arrays()
+            
+            self.assertListEqual(arrays.nodes, list(T.preorder()))
+            for i, v in enumerate(arrays.nodes):
+                if v.parent:
+                    self.assertIs(arrays.nodes[arrays.parent[i]], v.parent)
+                else:
+                    self.assertEqual(arrays.parent[i], -1)
+                self.assertEqual(arrays.event[i], event_code(v))
+                self.assertEqual(arrays.dist[i], v.dist)
+                self.assertEqual(arrays.tstamp[i], v.tstamp)
+                self.assertEqual(arrays.transferred[i], bool(v.transferred))
+    
+    
+    def test_loss_contraction(self):
+        
+        def climbing_contraction(tree):
+            # reference: delete the losses one by one and climb up
+            tree = tree.copy()
+            losses = [v for v in tree.postorder()
+                      if not v.children and v.is_loss()]
+            for loss in losses:
+                current = tree.delete_and_reconnect(loss)
+                while len(current.children) < 2 and current.parent:
+                    current = tree.delete_and_reconnect(current)
+            return tree
+        
+        repeats = 20
+        
+        for _ in range(repeats):
+            
+            S = te.simulate_species_tree(10, model='innovation')
+            T = te.simulate_dated_gene_tree(S, dupl_rate=1.0, loss_rate=1.0,
+                                            hgt_rate=0.5)
+            
+            T1 = climbing_contraction(T)
+            T2 = delete_losses_and_contract(T)
+            
+            self.assertEqual(T1.to_newick(), T2.to_newick())
+            self.assertListEqual(
+                [(v.ID, v.dist, v.transferred) for v in T1.preorder()],
+                [(v.ID, v.dist, v.transferred) for v in T2.preorder()])
+    
+    
     def test_serialization(self):
         
         N, colors = 30, 5
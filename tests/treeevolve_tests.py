@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 
-import unittest
+import unittest, random
+
+import numpy as np
 
 import asymmetree.treeevolve as te
 
@@ -57,7 +59,52 @@ class TestTreeEvolvePackage(unittest.TestCase):
             
             # check that there is no extinction in all species
             self.assertTrue(gene_tree2.supply_leaves())
+    
+    
+    def test_rates_yule(self):
+        
+        N = 10
+        repeats = 10
+        
+        for _ in range(repeats):
+            
+            species_tree = te.simulate_species_tree(N, model='yule')
+            
+            # Yule trees used to contain the ID 1 twice
+            IDs = [v.ID for v in species_tree.preorder()]
+            self.assertEqual(len(IDs), len(set(IDs)))
             
+            gene_trees = te.simulate_gene_trees(species_tree, N=5,
+                                                dupl_rate=1.0, loss_rate=0.5,
+                                                hgt_rate=0.5,
+                                                autocorr_variance=0.3)
+            
+            for gene_tree in gene_trees:
+                self.assertTrue(all(v.dist >= 0.0
+                                    for v in gene_tree.preorder()))
+            
+    
+    def test_parallel_gene_trees(self):
+        
+        species_tree = te.simulate_species_tree(10, model='innovation')
+        
+        results = []
+        for n_jobs in (2, 3):
+            random.seed(42)
+            np.random.seed(42)
+            gene_trees = te.simulate_gene_trees(species_tree, N=6,
+                                                dupl_rate=1.0, loss_rate=0.5,
+                                                hgt_rate=0.5,
+                                                autocorr_variance=0.2,
+                                                n_jobs=n_jobs)
+            results.append([T.to_newick() for T in gene_trees])
+        
+        self.assertListEqual(results[0], results[1])
+        
+        for n_jobs in (None, 0, -1, 1.5):
+            with self.assertRaises(ValueError):
+                te.simulate_gene_trees(species_tree, N=2, n_jobs=n_jobs)
+
 
 if __name__ == '__main__':
     